@@ -5,6 +5,7 @@
 
 Как использовать:
 1. Запустите скрипт: python generate_programs.py
+   (для больших таблиц быстрее запуск под PyPy: pypy3 generate_programs.py)
 2. Скрипт создаст файл programs.html с карточками программ
 3. Вставьте содержимое файла programs.html в блок с id="programs-container" на вашем сайте
 
@@ -17,13 +18,96 @@
 - url: Ссылка на программу
 """
 
-import requests
 import csv
-import html
+import functools
+import io
 from datetime import datetime
 import sys
 
 
+# Таблица замен для экранирования HTML-специфичных символов за один проход
+# (эквивалентно html.escape(s, quote=True))
+_ESC_TABLE = str.maketrans({
+    '&': '&amp;',
+    '<': '&lt;',
+    '>': '&gt;',
+    '"': '&quot;',
+    "'": '&#x27;',
+})
+
+# Шаблоны HTML-карточки; значения подставляются уже экранированными
+_CARD_TEMPLATE = """<div class="program-card">
+  <h3 class="program-title">{title}</h3>
+  <p class="program-description">{description}</p>{duration}
+  <a href="{url}" class="program-link">Подробнее</a>
+</div>"""
+_DURATION_TEMPLATE = '\n  <span class="program-duration">Уровень: {education_level}</span>'
+
+# Поля таблицы, которые используются при генерации карточек
+PROGRAM_FIELDS = (
+    'program_name',
+    'education_level',
+    'institution_name',
+    'region',
+    'budget_seats',
+    'url',
+)
+
+
+def _escape_unique(value):
+    """
+    Обрезает пробелы и экранирует HTML-специфичные символы в значении ячейки.
+    
+    Args:
+        value (str): Исходное значение ячейки
+    
+    Returns:
+        str: Экранированное значение
+    """
+    return value.strip().translate(_ESC_TABLE)
+
+
+# Почти уникальные поля (название, ссылка) экранируются через _escape_unique,
+# повторяющиеся (уровень, регион, учреждение, бюджетные места) - через кэш
+_escape = functools.lru_cache(maxsize=8192)(_escape_unique)
+
+
+def _read_csv(csv_content):
+    """
+    Разбирает CSV-текст на заголовок и строки данных.
+    
+    Пустые строки отбрасываются, как это делал csv.DictReader.
+    
+    Args:
+        csv_content (str): Содержимое CSV-файла
+    
+    Returns:
+        tuple: Пара (заголовок, список строк), где каждая строка - список значений
+    """
+    reader = csv.reader(io.StringIO(csv_content, newline=''))
+    header = next(reader, [])
+    return header, [row for row in reader if row]
+
+
+def build_field_index(header):
+    """
+    Строит соответствие между полями программы и номерами столбцов таблицы.
+    
+    Поля, отсутствующие в заголовке, указывают на столбец с номером
+    len(header). iter_program_cards приводит строки к такому виду, что
+    в этом столбце всегда пустое значение, даже если в строке есть
+    лишние ячейки.
+    
+    Args:
+        header (list): Заголовок таблицы
+    
+    Returns:
+        dict: Словарь {название поля: номер столбца}
+    """
+    positions = {name: i for i, name in enumerate(header)}
+    return {field: positions.get(field, len(header)) for field in PROGRAM_FIELDS}
+
+
 def fetch_csv_data(csv_url):
     """
     Загружает CSV-данные из указанного URL.
@@ -32,19 +116,34 @@ def fetch_csv_data(csv_url):
         csv_url (str): URL для экспорта CSV из Google Таблицы
     
     Returns:
-        list: Список словарей, представляющих строки таблицы
+        tuple: Пара (заголовок, список строк таблицы) или None при ошибке
     """
+    # requests импортируется лениво: это самый тяжёлый импорт скрипта,
+    # а нужен он только для загрузки таблицы
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    
+    # Повторяем запрос при кратковременных сбоях сервера и сети
+    retries = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+    )
+    adapter = HTTPAdapter(max_retries=retries)
+    
     try:
-        response = requests.get(csv_url)
+        with requests.Session() as session:
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            response = session.get(csv_url, timeout=30)
         response.raise_for_status()
         # Декодируем содержимое CSV
         csv_content = response.content.decode('utf-8')
         
-        # Парсим CSV
-        lines = csv_content.splitlines()
-        reader = csv.DictReader(lines)
-        
-        return list(reader)
+        # Парсим CSV, читая строки прямо из буфера без промежуточного списка
+        return _read_csv(csv_content)
     except requests.exceptions.RequestException as e:
         print(f"Ошибка при загрузке CSV: {e}")
         return None
@@ -52,9 +151,7 @@ def fetch_csv_data(csv_url):
         # Пробуем декодировать с другой кодировкой
         try:
             csv_content = response.content.decode('utf-8-sig')
-            lines = csv_content.splitlines()
-            reader = csv.DictReader(lines)
-            return list(reader)
+            return _read_csv(csv_content)
         except Exception as e:
             print(f"Ошибка при декодировании CSV: {e}")
             return None
@@ -63,29 +160,37 @@ def fetch_csv_data(csv_url):
         return None
 
 
-def generate_program_card(program_data):
+def generate_program_card(row, idx, *, title=None, url=None):
     """
     Генерирует HTML-карточку для одной образовательной программы.
     
     Args:
-        program_data (dict): Данные программы с ключами:
+        row (list): Строка таблицы со значениями столбцов. Должна содержать
+            все столбцы, на которые указывает idx, а столбец отсутствующих
+            полей (len(header)) должен быть пустым - строки в таком виде
+            выдаёт iter_program_cards
+        idx (dict): Номера столбцов для полей (см. build_field_index):
             - 'program_name' (Название программы)
             - 'education_level' (Уровень образования)
             - 'institution_name' (Название учреждения)
             - 'region' (Регион)
             - 'budget_seats' (Бюджетные места)
             - 'url' (Ссылка на программу)
+        title (str, optional): Уже экранированное название программы
+        url (str, optional): Уже экранированная ссылка на программу
     
     Returns:
         str: HTML-разметка карточки программы
     """
     # Экранируем HTML-специфичные символы
-    title = html.escape(program_data.get('program_name', '').strip())
-    education_level = html.escape(program_data.get('education_level', '').strip())
-    institution = html.escape(program_data.get('institution_name', '').strip())
-    region = html.escape(program_data.get('region', '').strip())
-    budget_seats = html.escape(program_data.get('budget_seats', '').strip())
-    url = html.escape(program_data.get('url', '').strip())
+    if title is None:
+        title = _escape_unique(row[idx['program_name']])
+    education_level = _escape(row[idx['education_level']])
+    institution = _escape(row[idx['institution_name']])
+    region = _escape(row[idx['region']])
+    budget_seats = _escape(row[idx['budget_seats']])
+    if url is None:
+        url = _escape_unique(row[idx['url']])
     
     # Формируем описание на основе доступных данных
     description_parts = []
@@ -100,24 +205,49 @@ def generate_program_card(program_data):
     
     description = ". ".join(description_parts)
     
-    # Формируем HTML-карточку
-    card_html = f"""<div class="program-card">
-  <h3 class="program-title">{title}</h3>
-  <p class="program-description">{description}</p>"""
-    
     # Добавляем дополнительную информацию, если доступна
-    if education_level:
-        card_html += f"\n  <span class=\"program-duration\">Уровень: {education_level}</span>"
+    duration = _DURATION_TEMPLATE.format(education_level=education_level) if education_level else ''
     
     # Добавляем цену, если она не пустая (в реальных данных стоимость отсутствует)
     # Но оставляем поле для совместимости с шаблоном
     
-    # Добавляем ссылку
-    card_html += f"""
-  <a href="{url}" class="program-link">Подробнее</a>
-</div>"""
+    # Формируем HTML-карточку за одну подстановку в шаблон
+    return _CARD_TEMPLATE.format(title=title, description=description, duration=duration, url=url)
+
+
+def iter_program_cards(header, data):
+    """
+    Генерирует HTML-карточки для строк таблицы, пропуская строки без обязательных полей.
     
-    return card_html
+    Args:
+        header (list): Заголовок таблицы
+        data (iterable): Строки таблицы в виде списков значений
+    
+    Yields:
+        str: HTML-разметка карточки программы
+    """
+    idx = build_field_index(header)
+    size = len(header)
+    # Если каких-то полей нет в заголовке, они указывают на столбец size,
+    # который должен быть пустым даже при лишних ячейках в строке
+    has_absent_fields = size in idx.values()
+    width = size + 1 if has_absent_fields else size
+    for row in data:
+        # Короткие строки дополняем пустыми значениями, а лишние ячейки
+        # за заголовком отбрасываем, если на их место указывают поля
+        if has_absent_fields or len(row) < size:
+            row = row[:size] + [''] * (width - min(len(row), size))
+        
+        # Проверяем, что основные поля присутствуют; найденные значения
+        # сразу передаём в карточку, чтобы не обрабатывать их повторно
+        title = _escape_unique(row[idx['program_name']])
+        url = _escape_unique(row[idx['url']])
+        if not title or not url:
+            missing_fields = [field for field, value in (('program_name', title), ('url', url)) if not value]
+            print(f"Предупреждение: В строке отсутствуют или пусты обязательные поля: {missing_fields}. Пропускаем эту строку.")
+            continue
+        
+        yield generate_program_card(row, idx, title=title, url=url)
 
 
 def main():
@@ -125,46 +255,45 @@ def main():
     csv_url = "https://docs.google.com/spreadsheets/d/12GNjcomxxU4NbXKwQ1Jq_eG7M7PLUlDlKAnBO4qwu5g/export?format=csv&gid=0"
     
     print("Загрузка данных из Google Таблицы...")
-    data = fetch_csv_data(csv_url)
+    result = fetch_csv_data(csv_url)
     
-    if data is None:
+    if result is None:
         print("Не удалось загрузить данные из таблицы.")
         sys.exit(1)
     
+    header, data = result
+    
     if not data:
         print("Таблица пуста или не содержит данных.")
         return
     
     print(f"Загружено {len(data)} записей из таблицы.")
     
-    # Генерируем HTML-карточки
-    html_cards = []
-    for row in data:
-        # Проверяем, что основные поля присутствуют
-        required_fields = ['program_name', 'url']
-        missing_fields = [field for field in required_fields if field not in row or not row[field].strip()]
-        if missing_fields:
-            print(f"Предупреждение: В строке отсутствуют или пусты обязательные поля: {missing_fields}. Пропускаем эту строку.")
-            continue
-        
-        card_html = generate_program_card(row)
-        html_cards.append(card_html)
+    # Генерируем HTML-карточки лениво, чтобы не держать их все в памяти
+    html_cards = iter_program_cards(header, data)
+    first_card = next(html_cards, None)
     
-    if not html_cards:
+    if first_card is None:
         print("Не удалось сгенерировать ни одной карточки из-за отсутствия необходимых полей в данных.")
         return
     
-    # Формируем итоговый HTML-файл
+    # Записываем карточки в файл по мере генерации
     current_date = datetime.now().strftime("%d.%m.%Y")
     header_comment = f"<!-- Сгенерировано автоматически {current_date} -->"
-    full_html = header_comment + "\n" + "\n".join(html_cards)
-    
-    # Сохраняем в файл
-    with open("programs.html", "w", encoding="utf-8") as f:
-        f.write(full_html)
+    cards_count = 1
+    # Пишем готовые UTF-8 байты в бинарном режиме с крупным буфером,
+    # минуя текстовый кодировщик файла
+    with open("programs.html", "wb", buffering=1 << 20) as f:
+        f.write(header_comment.encode("utf-8"))
+        f.write(b"\n")
+        f.write(first_card.encode("utf-8"))
+        for card_html in html_cards:
+            f.write(b"\n")
+            f.write(card_html.encode("utf-8"))
+            cards_count += 1
     
     print(f"HTML-карточки успешно сгенерированы и сохранены в файл programs.html")
-    print(f"Сгенерировано {len(html_cards)} карточек.")
+    print(f"Сгенерировано {cards_count} карточек.")
 
 
 if __name__ == "__main__":